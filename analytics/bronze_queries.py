@@ -1,136 +1,272 @@
+import functools
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from decimal import Decimal
 
-import boto3
-from boto3.dynamodb.types import TypeDeserializer
+from boto3.dynamodb.types import Binary
 
-from config.settings import AWSConfig, DynamoDBConfig
+from config.aws_clients import get_dynamodb_client
+from config.settings import DynamoDBConfig, QueryConfig
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def _deserialize_value(value: dict):
+    (type_tag, raw), = value.items()
+    return _DESERIALIZERS[type_tag](raw)
+
+
+# Flat type-tag dispatch, same output types as boto3's TypeDeserializer
+_DESERIALIZERS = {
+    'S': lambda raw: raw,
+    'N': Decimal,
+    'BOOL': bool,
+    'NULL': lambda raw: None,
+    'B': Binary,
+    'L': lambda raw: [_deserialize_value(v) for v in raw],
+    'M': lambda raw: {k: _deserialize_value(v) for k, v in raw.items()},
+    'SS': set,
+    'NS': lambda raw: {Decimal(v) for v in raw},
+    'BS': lambda raw: {Binary(v) for v in raw},
+}
+
+
+def cached(method):
+    # Serve repeated reads from an in-process TTL cache keyed by method and arguments
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+        
+        value = method(self, *args, **kwargs)
+        
+        with self._cache_lock:
+            if len(self._cache) >= QueryConfig.CACHE_MAX_ENTRIES:
+                self._evict_expired(now)
+            self._cache[key] = (value, now + QueryConfig.CACHE_TTL_SECONDS)
+        
+        return value
+    
+    return wrapper
+
+
+def _hour_buckets(start: datetime, end: datetime) -> list:
+    # Every hour bucket touched by [start, end], newest first
+    current = end.replace(minute=0, second=0, microsecond=0)
+    buckets = []
+    while current > start - timedelta(hours=1):
+        buckets.append(current.strftime(DynamoDBConfig.HOUR_BUCKET_FORMAT))
+        current -= timedelta(hours=1)
+    return buckets
+
+
 class BronzeQueryEngine:
     
+    # Key conditions that never vary between calls are built once here
+    _HIGH_RISK_KCE = 'risk_level = :risk'
+    _HIGH_RISK_EAV = {':risk': {'S': 'HIGH'}}
+    _ANOMALY_KCE = 'has_anomaly = :flag'
+    _ANOMALY_EAV = {':flag': {'S': 'Y'}}
+    _RECENT_KCE = 'hour_bucket = :bucket AND #ts > :cutoff_time'
+    _RECENT_EAN = {'#ts': 'timestamp'}
+    
     def __init__(self):
-        AWSConfig.set_env_vars()
-        
-        self.dynamodb = boto3.client(
-            'dynamodb',
-            endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
-            region_name=AWSConfig.REGION,
-            aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
-            aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY
-        )
+        self.dynamodb = get_dynamodb_client()
         
         self.table_name = DynamoDBConfig.BRONZE_TABLE_NAME
-        self.deserializer = TypeDeserializer()
+        
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=QueryConfig.MAX_WORKERS)
+    
+    def _evict_expired(self, now: float):
+        expired = [key for key, (_, expires_at) in self._cache.items() if expires_at <= now]
+        for key in expired:
+            del self._cache[key]
+        
+        # Still full: drop the oldest entry (dicts keep insertion order)
+        if len(self._cache) >= QueryConfig.CACHE_MAX_ENTRIES:
+            del self._cache[next(iter(self._cache))]
+    
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
     
     def deserialize_item(self, item: dict) -> dict:
-        python_item = {}
-        for key, value in item.items():
-            python_item[key] = self.deserializer.deserialize(value)
-        return python_item
+        return {key: _deserialize_value(value) for key, value in item.items()}
     
-    def get_event_by_id(self, event_id: str):
+    def _projection_params(self, projection: str = None, attribute_names: dict = None) -> dict:
+        params = {}
+        names = dict(attribute_names or {})
+        
+        if projection:
+            params['ProjectionExpression'] = projection
+            # 'timestamp' is a reserved word, projections refer to it as #ts
+            if '#ts' in projection:
+                names['#ts'] = 'timestamp'
+        
+        if names:
+            params['ExpressionAttributeNames'] = names
+        return params
+    
+    def _iter_query(self, limit: int, **params):
+        # The paginator follows LastEvaluatedKey and stops once MaxItems items were returned
+        paginator = self.dynamodb.get_paginator('query')
+        pages = paginator.paginate(
+            PaginationConfig={'MaxItems': limit, 'PageSize': min(limit, 1000)},
+            **params
+        )
+        
+        for page in pages:
+            for item in page['Items']:
+                yield self.deserialize_item(item)
+    
+    def get_event_by_id(self, event_id: str, projection: str = None):
         logger.info(f"Querying event by ID: {event_id}")
         
-        response = self.dynamodb.query(
+        items = list(self._iter_query(
+            10,
             TableName=self.table_name,
             KeyConditionExpression='event_id = :event_id',
             ExpressionAttributeValues={
                 ':event_id': {'S': event_id}
             },
-            Limit=10
-        )
-        
-        items = [self.deserialize_item(item) for item in response['Items']]
+            **self._projection_params(projection)
+        ))
         
         logger.info(f"Found {len(items)} events with ID {event_id}")
         return items
     
-    def get_events_by_customer(self, customer_id: str, limit: int = 10):
-        logger.info(f"Querying events for customer: {customer_id}")
-        
-        response = self.dynamodb.query(
+    def iter_events_by_customer(self, customer_id: str, limit: int = 10, projection: str = None):
+        return self._iter_query(
+            limit,
             TableName=self.table_name,
             IndexName='customer_id-timestamp-index',
             KeyConditionExpression='customer_id = :customer_id',
             ExpressionAttributeValues={
                 ':customer_id': {'S': customer_id}
             },
-            Limit=limit,
-            ScanIndexForward=False
+            ScanIndexForward=False,
+            **self._projection_params(projection)
         )
+    
+    @cached
+    def get_events_by_customer(self, customer_id: str, limit: int = 10, projection: str = None):
+        logger.info(f"Querying events for customer: {customer_id}")
         
-        items = [self.deserialize_item(item) for item in response['Items']]
+        items = list(self.iter_events_by_customer(customer_id, limit, projection))
         
         logger.info(f"Found {len(items)} events for customer {customer_id}")
         return items
     
-    def get_high_risk_events(self, limit: int = 10):
-        logger.info(f"Querying high risk events")
-        
-        response = self.dynamodb.query(
+    def iter_high_risk_events(self, limit: int = 10, projection: str = None):
+        return self._iter_query(
+            limit,
             TableName=self.table_name,
             IndexName='risk_level-timestamp-index',
-            KeyConditionExpression='risk_level = :risk',
-            ExpressionAttributeValues={
-                ':risk': {'S': 'HIGH'}
-            },
-            Limit=limit,
-            ScanIndexForward=False
+            KeyConditionExpression=self._HIGH_RISK_KCE,
+            ExpressionAttributeValues=self._HIGH_RISK_EAV,
+            ScanIndexForward=False,
+            **self._projection_params(projection)
         )
+    
+    @cached
+    def get_high_risk_events(self, limit: int = 10, projection: str = None):
+        logger.info(f"Querying high risk events")
         
-        items = [self.deserialize_item(item) for item in response['Items']]
+        items = list(self.iter_high_risk_events(limit, projection))
         
         logger.info(f"Found {len(items)} high risk events")
         return items
     
-    def get_anomaly_events(self, limit: int = 20):
-        logger.info(f"Scanning for anomaly events")
-        
-        response = self.dynamodb.scan(
+    def iter_anomaly_events(self, limit: int = 20, projection: str = None):
+        return self._iter_query(
+            limit,
             TableName=self.table_name,
-            FilterExpression='attribute_exists(anomaly_flags)',
-            Limit=limit
+            IndexName='has_anomaly-timestamp-index',
+            KeyConditionExpression=self._ANOMALY_KCE,
+            ExpressionAttributeValues=self._ANOMALY_EAV,
+            ScanIndexForward=False,
+            **self._projection_params(projection)
         )
+    
+    @cached
+    def get_anomaly_events(self, limit: int = 20, projection: str = None):
+        logger.info(f"Querying anomaly events")
         
-        items = [self.deserialize_item(item) for item in response['Items']]
+        items = list(self.iter_anomaly_events(limit, projection))
         
         logger.info(f"Found {len(items)} events with anomalies")
         return items
     
-    def count_total_events(self) -> int:
+    @cached
+    def count_total_events(self, exact: bool = False) -> int:
         logger.info("Counting total events in table")
         
-        response = self.dynamodb.scan(
-            TableName=self.table_name,
-            Select='COUNT'
-        )
+        if exact:
+            # A single scan call stops at 1 MB, so the per-page counts are summed
+            paginator = self.dynamodb.get_paginator('scan')
+            pages = paginator.paginate(TableName=self.table_name, Select='COUNT')
+            count = sum(page['Count'] for page in pages)
+        else:
+            # ItemCount is table metadata refreshed by DynamoDB roughly every 6 hours
+            response = self.dynamodb.describe_table(TableName=self.table_name)
+            count = response['Table']['ItemCount']
         
-        count = response['Count']
         logger.info(f"Total events in bronze table: {count}")
         return count
     
-    def get_recent_events(self, minutes: int = 5, limit: int = 20):
-        logger.info(f"Querying events from last {minutes} minutes")
-        
-        cutoff_time = (datetime.now() - timedelta(minutes=minutes)).isoformat()
-        
-        response = self.dynamodb.scan(
+    def _iter_hour_bucket(self, bucket: str, cutoff_time: str, limit: int, projection: str = None):
+        return self._iter_query(
+            limit,
             TableName=self.table_name,
-            FilterExpression='#ts > :cutoff_time',
-            ExpressionAttributeNames={
-                '#ts': 'timestamp'
-            },
+            IndexName='hour_bucket-timestamp-index',
+            KeyConditionExpression=self._RECENT_KCE,
             ExpressionAttributeValues={
+                ':bucket': {'S': bucket},
                 ':cutoff_time': {'S': cutoff_time}
             },
-            Limit=limit
+            ScanIndexForward=False,
+            **self._projection_params(projection, self._RECENT_EAN)
         )
+    
+    def iter_recent_events(self, minutes: int = 5, limit: int = 20, projection: str = None):
+        now = datetime.now()
+        cutoff = now - timedelta(minutes=minutes)
+        cutoff_time = cutoff.isoformat()
         
-        items = [self.deserialize_item(item) for item in response['Items']]
+        remaining = limit
+        for bucket in _hour_buckets(cutoff, now):
+            for item in self._iter_hour_bucket(bucket, cutoff_time, remaining, projection):
+                remaining -= 1
+                yield item
+            if remaining <= 0:
+                return
+    
+    @cached
+    def get_recent_events(self, minutes: int = 5, limit: int = 20, projection: str = None):
+        logger.info(f"Querying events from last {minutes} minutes")
+        
+        now = datetime.now()
+        cutoff = now - timedelta(minutes=minutes)
+        cutoff_time = cutoff.isoformat()
+        
+        # Unlike iter_recent_events, buckets are fetched concurrently; they come back newest first
+        pages = self._executor.map(
+            lambda bucket: list(self._iter_hour_bucket(bucket, cutoff_time, limit, projection)),
+            _hour_buckets(cutoff, now)
+        )
+        
+        items = [item for page in pages for item in page][:limit]
         
         logger.info(f"Found {len(items)} events in last {minutes} minutes")
         return items
@@ -148,24 +284,30 @@ def main():
     
     query_engine = BronzeQueryEngine()
     
-    total_count = query_engine.count_total_events()
+    total_count = query_engine.count_total_events(exact=True)
     
     if total_count == 0:
         logger.info("No events found. Run producer and consumer first.")
         return
     
+    # Independent queries, issued concurrently and displayed in order
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        recent_future = executor.submit(query_engine.get_recent_events, minutes=10, limit=5)
+        high_risk_future = executor.submit(query_engine.get_high_risk_events, limit=5)
+        anomaly_future = executor.submit(query_engine.get_anomaly_events, limit=5)
+    
     logger.info(f"\n1. Recent events ({total_count} total)")
-    recent_events = query_engine.get_recent_events(minutes=10, limit=5)
+    recent_events = recent_future.result()
     for event in recent_events:
         display_event(event)
     
     logger.info("\n2. High risk events")
-    high_risk_events = query_engine.get_high_risk_events(limit=5)
+    high_risk_events = high_risk_future.result()
     for event in high_risk_events:
         display_event(event)
     
     logger.info("\n3. Events with anomalies")
-    anomaly_events = query_engine.get_anomaly_events(limit=5)
+    anomaly_events = anomaly_future.result()
     for event in anomaly_events:
         display_event(event)
     
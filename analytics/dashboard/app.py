@@ -1,16 +1,27 @@
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from flask import Flask, render_template, jsonify
+from flask_orjson import OrjsonProvider
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
 from analytics.bronze_queries import BronzeQueryEngine
+from config.settings import QueryConfig
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 query_engine = BronzeQueryEngine()
+executor = ThreadPoolExecutor(max_workers=QueryConfig.MAX_WORKERS)
+
+_EMPTY = {}
+# Month sections are six values, september first; this stands in when a section is missing
+_NA_MONTHS = ('N/A',) * 6
+# Items stored before the list layout keep month-keyed dicts; same order as the generator's MONTHS
+_MONTH_KEYS = ('september', 'august', 'july', 'june', 'may', 'april')
 
 
 @app.route('/')
@@ -20,8 +31,14 @@ def index():
 
 @app.route('/api/stats')
 def get_stats():
-    total = query_engine.count_total_events()
-    recent = query_engine.get_recent_events(minutes=5, limit=100)
+    total_future = executor.submit(query_engine.count_total_events)
+    # Only the fields counted below are transferred
+    recent_future = executor.submit(
+        query_engine.get_recent_events,
+        minutes=5, limit=100, projection='risk.risk_level, anomaly_flags'
+    )
+    total = total_future.result()
+    recent = recent_future.result()
     
     high_risk_count = sum(1 for e in recent if e.get('risk', {}).get('risk_level') == 'HIGH')
     anomaly_count = sum(1 for e in recent if 'anomaly_flags' in e)
@@ -52,49 +69,59 @@ def get_anomalies():
     return jsonify([format_event(e) for e in events])
 
 
+def _month_values(section):
+    if isinstance(section, dict):
+        return [section.get(month, 'N/A') for month in _MONTH_KEYS]
+    return section
+
+
 def format_event(event):
-    demographic = event.get('customer', {}).get('demographic', {})
-    payment_history = event.get('payment_history', {})
-    billing = event.get('billing', {})
-    payments = event.get('payments', {})
-    risk = event.get('risk', {})
+    # Section lookups are hoisted once per event; missing sections share one read-only default
+    customer = event['customer']
+    demographic = customer.get('demographic', _EMPTY)
+    credit = event.get('credit', _EMPTY)
+    payment_history = _month_values(event.get('payment_history', _NA_MONTHS))
+    billing = _month_values(event.get('billing_amounts', _NA_MONTHS))
+    payments = _month_values(event.get('payment_amounts', _NA_MONTHS))
+    risk = event.get('risk', _EMPTY)
+    anomaly_flags = event.get('anomaly_flags', ())
     
     return {
         'event_id': event['event_id'],
         'timestamp': event['timestamp'],
         'event_type': event.get('event_type', 'N/A'),
         'source_system': event.get('source_system', 'N/A'),
-        'customer_id': event['customer']['customer_id'],
+        'customer_id': customer['customer_id'],
         'sex': demographic.get('sex', 'N/A'),
         'age': demographic.get('age', 'N/A'),
         'education': demographic.get('education', 'N/A'),
         'marital_status': demographic.get('marital_status', 'N/A'),
-        'credit_limit': event.get('credit', {}).get('credit_limit', 0),
-        'currency': event.get('credit', {}).get('currency', 'N/A'),
-        'pay_september': payment_history.get('september', 'N/A'),
-        'pay_august': payment_history.get('august', 'N/A'),
-        'pay_july': payment_history.get('july', 'N/A'),
-        'pay_june': payment_history.get('june', 'N/A'),
-        'pay_may': payment_history.get('may', 'N/A'),
-        'pay_april': payment_history.get('april', 'N/A'),
-        'bill_september': billing.get('bill_amt_september', 'N/A'),
-        'bill_august': billing.get('bill_amt_august', 'N/A'),
-        'bill_july': billing.get('bill_amt_july', 'N/A'),
-        'bill_june': billing.get('bill_amt_june', 'N/A'),
-        'bill_may': billing.get('bill_amt_may', 'N/A'),
-        'bill_april': billing.get('bill_amt_april', 'N/A'),
-        'payment_september': payments.get('payment_amt_september', 'N/A'),
-        'payment_august': payments.get('payment_amt_august', 'N/A'),
-        'payment_july': payments.get('payment_amt_july', 'N/A'),
-        'payment_june': payments.get('payment_amt_june', 'N/A'),
-        'payment_may': payments.get('payment_amt_may', 'N/A'),
-        'payment_april': payments.get('payment_amt_april', 'N/A'),
+        'credit_limit': credit.get('credit_limit', 0),
+        'currency': credit.get('currency', 'N/A'),
+        'pay_september': payment_history[0],
+        'pay_august': payment_history[1],
+        'pay_july': payment_history[2],
+        'pay_june': payment_history[3],
+        'pay_may': payment_history[4],
+        'pay_april': payment_history[5],
+        'bill_september': billing[0],
+        'bill_august': billing[1],
+        'bill_july': billing[2],
+        'bill_june': billing[3],
+        'bill_may': billing[4],
+        'bill_april': billing[5],
+        'payment_september': payments[0],
+        'payment_august': payments[1],
+        'payment_july': payments[2],
+        'payment_june': payments[3],
+        'payment_may': payments[4],
+        'payment_april': payments[5],
         'risk_level': risk.get('risk_level', 'N/A'),
         'default_payment': risk.get('default_payment_next_month', 'N/A'),
         'has_anomaly': 'anomaly_flags' in event,
-        'anomaly_count': len(event.get('anomaly_flags', [])),
-        'anomaly_types': ', '.join([f['type'] for f in event.get('anomaly_flags', [])]) if 'anomaly_flags' in event else '',
-        'anomaly_severities': ', '.join([f['severity'] for f in event.get('anomaly_flags', [])]) if 'anomaly_flags' in event else ''
+        'anomaly_count': len(anomaly_flags),
+        'anomaly_types': ', '.join([f['type'] for f in anomaly_flags]),
+        'anomaly_severities': ', '.join([f['severity'] for f in anomaly_flags])
     }
 
 
@@ -0,0 +1,48 @@
+import threading
+
+import boto3
+from botocore.config import Config
+
+from config.settings import AWSConfig
+
+_CLIENT_CONFIG = Config(
+    max_pool_connections=AWSConfig.MAX_POOL_CONNECTIONS,
+    retries={'mode': 'standard', 'max_attempts': AWSConfig.MAX_ATTEMPTS},
+    tcp_keepalive=True
+)
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+
+
+def _get_client(service_name: str):
+    client = _clients.get(service_name)
+    if client is not None:
+        return client
+    
+    # Sessions are not thread-safe, so building them is serialized; the clients themselves are
+    global _session
+    with _lock:
+        if service_name not in _clients:
+            if _session is None:
+                _session = boto3.session.Session(
+                    aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
+                    aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY,
+                    region_name=AWSConfig.REGION
+                )
+            
+            _clients[service_name] = _session.client(
+                service_name,
+                endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
+                config=_CLIENT_CONFIG
+            )
+        return _clients[service_name]
+
+
+def get_dynamodb_client():
+    return _get_client('dynamodb')
+
+
+def get_kinesis_client():
+    return _get_client('kinesis')
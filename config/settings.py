@@ -9,12 +9,8 @@ class AWSConfig:
     SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'test')
     REGION = os.getenv('AWS_REGION', 'us-east-1')
     LOCALSTACK_ENDPOINT = os.getenv('LOCALSTACK_ENDPOINT', 'http://localhost:4566')
-    
-    @classmethod
-    def set_env_vars(cls):
-        os.environ['AWS_ACCESS_KEY_ID'] = cls.ACCESS_KEY_ID
-        os.environ['AWS_SECRET_ACCESS_KEY'] = cls.SECRET_ACCESS_KEY
-        os.environ['AWS_DEFAULT_REGION'] = cls.REGION
+    MAX_POOL_CONNECTIONS = 64
+    MAX_ATTEMPTS = 5
 
 
 class KinesisConfig:
@@ -24,25 +20,56 @@ class KinesisConfig:
 
 class DynamoDBConfig:
     BRONZE_TABLE_NAME = 'banking_events_bronze'
+    HOUR_BUCKET_FORMAT = '%Y-%m-%dT%H'
     READ_CAPACITY_UNITS = 10
     WRITE_CAPACITY_UNITS = 10
     GSI_READ_CAPACITY_UNITS = 5
     GSI_WRITE_CAPACITY_UNITS = 5
 
 
+class QueryConfig:
+    CACHE_TTL_SECONDS = 5
+    CACHE_MAX_ENTRIES = 128
+    MAX_WORKERS = 8
+
+
+class DashboardConfig:
+    HOST = '0.0.0.0'
+    PORT = 5000
+    THREADS = 16
+
+
 class ProducerConfig:
     ANOMALY_RATE = 0.08
     BASE_LATENCY_MS = 150
     NETWORK_CONDITION = 'good'
     MAX_DURATION_HOURS = 2.0
-    SHOW_DETAILS = True
+    SHOW_DETAILS = False
+    BATCH_SIZE = 500
+    BATCH_MAX_BYTES = 4 * 1024 * 1024
+    BATCH_MAX_LINGER_SECONDS = 1.0
+    AGGREGATION_MAX_BYTES = 25 * 1024
+    COMPRESS_RECORDS = True
+    MAX_RETRIES = 5
+    RETRY_BASE_DELAY_SECONDS = 0.1
+    QUEUE_SIZE = 512
+    SENDER_WORKERS = 4
+    STATS_INTERVAL = 1000
 
 
 class ConsumerConfig:
     MAX_DURATION_HOURS = 2.0
-    BATCH_SIZE = 10
-    POLL_INTERVAL_SECONDS = 2
-    STATS_INTERVAL = 20
+    BATCH_SIZE = 10000
+    POLL_INTERVAL_SECONDS = 0.2
+    POLL_MAX_INTERVAL_SECONDS = 5.0
+    STATS_INTERVAL = 1000
+    CHECKPOINT_INTERVAL_SECONDS = 1.0
+    QUEUE_SIZE = 64
+    IDLE_LOG_INTERVAL_SECONDS = 2
+    WRITE_BATCH_SIZE = 25
+    WRITE_WORKERS = 8
+    WRITE_MAX_RETRIES = 5
+    WRITE_RETRY_BASE_DELAY_SECONDS = 0.05
 
 
 class LoggingConfig:
@@ -59,4 +86,9 @@ class PathConfig:
     def get_dataset_path():
         root = PathConfig.get_project_root()
         return os.path.join(root, 'simulators', 'data', 'credit_card_dataset.xls')
+    
+    @staticmethod
+    def get_consumer_state_path():
+        root = PathConfig.get_project_root()
+        return os.path.join(root, '.consumer_state.json')
 
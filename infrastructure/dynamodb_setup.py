@@ -1,26 +1,78 @@
 import logging
 import time
 
-import boto3
-
-from config.settings import AWSConfig, DynamoDBConfig
+from config.aws_clients import get_dynamodb_client
+from config.settings import DynamoDBConfig
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+_ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'event_id', 'AttributeType': 'S'},
+    {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+    {'AttributeName': 'customer_id', 'AttributeType': 'S'},
+    {'AttributeName': 'risk_level', 'AttributeType': 'S'},
+    {'AttributeName': 'has_anomaly', 'AttributeType': 'S'},
+    {'AttributeName': 'hour_bucket', 'AttributeType': 'S'}
+]
+
+_GLOBAL_SECONDARY_INDEXES = [
+    {
+        'IndexName': 'customer_id-timestamp-index',
+        'KeySchema': [
+            {'AttributeName': 'customer_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {
+            'ReadCapacityUnits': DynamoDBConfig.GSI_READ_CAPACITY_UNITS,
+            'WriteCapacityUnits': DynamoDBConfig.GSI_WRITE_CAPACITY_UNITS
+        }
+    },
+    {
+        'IndexName': 'risk_level-timestamp-index',
+        'KeySchema': [
+            {'AttributeName': 'risk_level', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {
+            'ReadCapacityUnits': DynamoDBConfig.GSI_READ_CAPACITY_UNITS,
+            'WriteCapacityUnits': DynamoDBConfig.GSI_WRITE_CAPACITY_UNITS
+        }
+    },
+    {
+        # Sparse index: only items carrying has_anomaly are projected into it
+        'IndexName': 'has_anomaly-timestamp-index',
+        'KeySchema': [
+            {'AttributeName': 'has_anomaly', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {
+            'ReadCapacityUnits': DynamoDBConfig.GSI_READ_CAPACITY_UNITS,
+            'WriteCapacityUnits': DynamoDBConfig.GSI_WRITE_CAPACITY_UNITS
+        }
+    },
+    {
+        'IndexName': 'hour_bucket-timestamp-index',
+        'KeySchema': [
+            {'AttributeName': 'hour_bucket', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {
+            'ReadCapacityUnits': DynamoDBConfig.GSI_READ_CAPACITY_UNITS,
+            'WriteCapacityUnits': DynamoDBConfig.GSI_WRITE_CAPACITY_UNITS
+        }
+    }
+]
+
 
 class DynamoDBSetup:
     
     def __init__(self):
-        AWSConfig.set_env_vars()
-        
-        self.dynamodb = boto3.client(
-            'dynamodb',
-            endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
-            region_name=AWSConfig.REGION,
-            aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
-            aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY
-        )
+        self.dynamodb = get_dynamodb_client()
         
         self.table_name = DynamoDBConfig.BRONZE_TABLE_NAME
     
@@ -35,6 +87,7 @@ class DynamoDBSetup:
     def create_bronze_table(self):
         if self.table_exists():
             logger.info(f"Table {self.table_name} already exists")
+            self.add_missing_indexes()
             return
         
         logger.info(f"Creating table {self.table_name}")
@@ -45,46 +98,46 @@ class DynamoDBSetup:
                 {'AttributeName': 'event_id', 'KeyType': 'HASH'},
                 {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
             ],
-            AttributeDefinitions=[
-                {'AttributeName': 'event_id', 'AttributeType': 'S'},
-                {'AttributeName': 'timestamp', 'AttributeType': 'S'},
-                {'AttributeName': 'customer_id', 'AttributeType': 'S'},
-                {'AttributeName': 'risk_level', 'AttributeType': 'S'}
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    'IndexName': 'customer_id-timestamp-index',
-                    'KeySchema': [
-                        {'AttributeName': 'customer_id', 'KeyType': 'HASH'},
-                        {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
-                    ],
-                    'Projection': {'ProjectionType': 'ALL'},
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': DynamoDBConfig.GSI_READ_CAPACITY_UNITS,
-                        'WriteCapacityUnits': DynamoDBConfig.GSI_WRITE_CAPACITY_UNITS
-                    }
-                },
-                {
-                    'IndexName': 'risk_level-timestamp-index',
-                    'KeySchema': [
-                        {'AttributeName': 'risk_level', 'KeyType': 'HASH'},
-                        {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
-                    ],
-                    'Projection': {'ProjectionType': 'ALL'},
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': DynamoDBConfig.GSI_READ_CAPACITY_UNITS,
-                        'WriteCapacityUnits': DynamoDBConfig.GSI_WRITE_CAPACITY_UNITS
-                    }
-                }
-            ],
+            AttributeDefinitions=_ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexes=_GLOBAL_SECONDARY_INDEXES,
             ProvisionedThroughput={
                 'ReadCapacityUnits': DynamoDBConfig.READ_CAPACITY_UNITS,
                 'WriteCapacityUnits': DynamoDBConfig.WRITE_CAPACITY_UNITS
             }
         )
         
+        waiter = self.dynamodb.get_waiter('table_exists')
+        waiter.wait(TableName=self.table_name, WaiterConfig={'Delay': 1})
+        
         logger.info("Table created")
     
+    def add_missing_indexes(self):
+        # Tables created by older versions lack the anomaly and hour-bucket indexes the queries rely on
+        table_info = self.dynamodb.describe_table(TableName=self.table_name)['Table']
+        existing = {gsi['IndexName'] for gsi in table_info.get('GlobalSecondaryIndexes', [])}
+        
+        for index in _GLOBAL_SECONDARY_INDEXES:
+            if index['IndexName'] in existing:
+                continue
+            
+            logger.info(f"Adding missing index {index['IndexName']}")
+            # DynamoDB builds one new index per UpdateTable call, so each must be ACTIVE before the next
+            self.dynamodb.update_table(
+                TableName=self.table_name,
+                AttributeDefinitions=_ATTRIBUTE_DEFINITIONS,
+                GlobalSecondaryIndexUpdates=[{'Create': index}]
+            )
+            self._wait_for_index(index['IndexName'])
+    
+    def _wait_for_index(self, index_name: str):
+        # There is no boto3 waiter for index status, so describe_table is polled
+        while True:
+            table_info = self.dynamodb.describe_table(TableName=self.table_name)['Table']
+            statuses = {gsi['IndexName']: gsi.get('IndexStatus') for gsi in table_info.get('GlobalSecondaryIndexes', [])}
+            if table_info['TableStatus'] == 'ACTIVE' and statuses.get(index_name) == 'ACTIVE':
+                return
+            time.sleep(1)
+    
     def describe_table(self):
         response = self.dynamodb.describe_table(TableName=self.table_name)
         table_info = response['Table']
@@ -98,7 +151,6 @@ class DynamoDBSetup:
     def setup(self):
         self.wait_for_localstack()
         self.create_bronze_table()
-        time.sleep(2)
         self.describe_table()
 
 
@@ -1,9 +1,10 @@
 import logging
 import time
 
-import boto3
+from botocore.exceptions import EndpointConnectionError
 
-from config.settings import AWSConfig, KinesisConfig
+from config.aws_clients import get_kinesis_client
+from config.settings import KinesisConfig
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -12,21 +13,21 @@ logger = logging.getLogger(__name__)
 class KinesisSetup:
     
     def __init__(self):
-        AWSConfig.set_env_vars()
-        
-        self.kinesis = boto3.client(
-            'kinesis',
-            endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
-            region_name=AWSConfig.REGION,
-            aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
-            aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY
-        )
+        self.kinesis = get_kinesis_client()
         
         self.stream_name = KinesisConfig.STREAM_NAME
         self.shard_count = KinesisConfig.SHARD_COUNT
     
     def wait_for_localstack(self):
-        time.sleep(5)
+        # Back off until LocalStack answers instead of sleeping a fixed 5s
+        for delay in (0.05, 0.1, 0.2, 0.4, 0.8, 1.6):
+            try:
+                self.kinesis.list_streams()
+                return
+            except EndpointConnectionError:
+                time.sleep(delay)
+        
+        self.kinesis.list_streams()
     
     def stream_exists(self) -> bool:
         response = self.kinesis.list_streams()
@@ -44,6 +45,9 @@ class KinesisSetup:
             ShardCount=self.shard_count
         )
         
+        waiter = self.kinesis.get_waiter('stream_exists')
+        waiter.wait(StreamName=self.stream_name, WaiterConfig={'Delay': 1})
+        
         logger.info("Stream created")
     
     def verify_stream(self):
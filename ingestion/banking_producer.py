@@ -1,13 +1,18 @@
-import json
 import logging
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
+import orjson
+from botocore.exceptions import BotoCoreError, ClientError
 
-from config.settings import AWSConfig, KinesisConfig, ProducerConfig
+from config.aws_clients import get_kinesis_client
+from config.settings import KinesisConfig, ProducerConfig
 from simulators.anomaly_injector import AnomalyInjector
 from simulators.banking_data_generator import BankingDataGenerator
 from simulators.latency_simulator import LatencySimulator, WindowAggregator
+from streaming.aggregation import AggregatedRecord
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -21,15 +26,7 @@ class BankingEventProducer:
                  base_latency_ms: float = None,
                  network_condition: str = None):
         
-        AWSConfig.set_env_vars()
-        
-        self.kinesis = boto3.client(
-            'kinesis',
-            endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
-            region_name=AWSConfig.REGION,
-            aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
-            aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY
-        )
+        self.kinesis = get_kinesis_client()
         
         self.stream_name = KinesisConfig.STREAM_NAME
         
@@ -38,29 +35,153 @@ class BankingEventProducer:
         network_condition = network_condition or ProducerConfig.NETWORK_CONDITION
         
         self.data_generator = BankingDataGenerator(dataset_path)
-        self.anomaly_injector = AnomalyInjector(anomaly_rate=anomaly_rate)
+        # Generated events are owned by the producer and only read after injection
+        self.anomaly_injector = AnomalyInjector(anomaly_rate=anomaly_rate, mutate_in_place=True)
         self.latency_simulator = LatencySimulator(base_latency_ms=base_latency_ms)
         self.latency_simulator.simulate_network_conditions(network_condition)
         
-        self.window_5min = WindowAggregator(window_size_seconds=300)
-        self.window_1hour = WindowAggregator(window_size_seconds=3600)
+        self.windows = WindowAggregator(window_sizes=(300, 3600))
         
         self.events_sent = 0
         self.errors = 0
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_started = time.monotonic()
+        self._aggregate = None
+        self._buffer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=ProducerConfig.QUEUE_SIZE)
         self._start_time = time.time()
         
         logger.info(f"Producer initialized. Target: {self.stream_name}")
     
     def send_to_kinesis(self, event: dict) -> bool:
-        response = self.kinesis.put_record(
-            StreamName=self.stream_name,
-            Data=json.dumps(event, ensure_ascii=False),
-            PartitionKey=event['customer']['customer_id']
-        )
+        data = orjson.dumps(event)
+        
+        records = None
+        with self._buffer_lock:
+            if not self._buffer and self._aggregate is None:
+                self._buffer_started = time.monotonic()
+            
+            # Events are packed into records of up to AGGREGATION_MAX_BYTES, one Kinesis PUT payload unit
+            if self._aggregate is not None and not self._aggregate.can_fit(data):
+                self._close_aggregate()
+            if self._aggregate is None:
+                # Only the first event of a record picks its shard, so the key is looked up just here
+                self._aggregate = AggregatedRecord(
+                    event['customer']['customer_id'],
+                    ProducerConfig.AGGREGATION_MAX_BYTES,
+                    compress=ProducerConfig.COMPRESS_RECORDS
+                )
+            self._aggregate.add(data)
+            
+            # A full batch ships at once; a slow trickle still ships within BATCH_MAX_LINGER_SECONDS
+            if (len(self._buffer) >= ProducerConfig.BATCH_SIZE
+                    or self._buffer_bytes >= ProducerConfig.BATCH_MAX_BYTES
+                    or time.monotonic() - self._buffer_started >= ProducerConfig.BATCH_MAX_LINGER_SECONDS):
+                records = self._take_buffer()
+        
+        # The network call happens outside the lock so other senders keep buffering
+        if records:
+            self._put_records(records)
         
-        self.events_sent += 1
         return True
     
+    def flush(self):
+        with self._buffer_lock:
+            records = self._take_buffer()
+        
+        if records:
+            self._put_records(records)
+    
+    def _close_aggregate(self):
+        aggregate = self._aggregate
+        self._buffer.append(aggregate)
+        self._buffer_bytes += aggregate.size + len(aggregate.partition_key)
+        self._aggregate = None
+    
+    def _take_buffer(self) -> list:
+        if self._aggregate is not None:
+            self._close_aggregate()
+        aggregates = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        return aggregates
+    
+    def _put_records(self, aggregates: list):
+        for attempt in range(ProducerConfig.MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(ProducerConfig.RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+            
+            try:
+                response = self.kinesis.put_records(
+                    StreamName=self.stream_name,
+                    Records=[aggregate.to_record() for aggregate in aggregates]
+                )
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(f"PutRecords failed for {len(aggregates)} records: {e}")
+                continue
+            
+            # Results are positional; only entries carrying an ErrorCode need a retry
+            failed = []
+            if response.get('FailedRecordCount'):
+                failed = [
+                    aggregate for aggregate, result in zip(aggregates, response['Records'])
+                    if 'ErrorCode' in result
+                ]
+            
+            with self._stats_lock:
+                self.events_sent += sum(map(len, aggregates)) - sum(map(len, failed))
+            if not failed:
+                return
+            
+            logger.warning(f"{len(failed)} of {len(aggregates)} records failed, retrying")
+            aggregates = failed
+        
+        dropped = sum(map(len, aggregates))
+        with self._stats_lock:
+            self.errors += dropped
+        logger.error(f"Dropped {dropped} events after {ProducerConfig.MAX_RETRIES} retries")
+    
+    def _send_loop(self):
+        while True:
+            try:
+                event = self._queue.get(timeout=ProducerConfig.BATCH_MAX_LINGER_SECONDS)
+            except queue.Empty:
+                # No new events to trigger a send, so ship what is buffered instead of letting it sit
+                self.flush()
+                continue
+            if event is None:
+                return
+            self.send_to_kinesis(event)
+    
+    def _check_senders(self, senders: list):
+        # Re-raises a sender's exception; a sender that stopped without one still leaves nobody to drain the queue
+        for future in senders:
+            if future.done():
+                future.result()
+        if all(future.done() for future in senders):
+            raise RuntimeError("All Kinesis sender threads have stopped")
+    
+    def _enqueue(self, event: dict, senders: list):
+        # A timed put lets a dead sender surface here instead of blocking forever on a full queue
+        while True:
+            try:
+                self._queue.put(event, timeout=1)
+                return
+            except queue.Full:
+                self._check_senders(senders)
+    
+    def _stop_senders(self, senders: list):
+        # One sentinel per sender; the queue is only waited on while some sender is alive to take one
+        for _ in senders:
+            while not all(future.done() for future in senders):
+                try:
+                    self._queue.put(None, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+    
     def produce_events(self, count: int = None, show_details: bool = None, max_duration_hours: float = None):
         count = count if count is not None else None
         show_details = show_details if show_details is not None else ProducerConfig.SHOW_DETAILS
@@ -72,48 +193,70 @@ class BankingEventProducer:
         else:
             logger.info(f"Producing {count} events")
         
-        start_time = time.time()
-        max_duration_seconds = max_duration_hours * 3600
+        # Only continuous mode (count=None) is bounded by time
+        deadline = time.time() + max_duration_hours * 3600 if count == float('inf') else float('inf')
         i = 0
         
-        for base_event in self.data_generator.stream_events(count=None):
-            i += 1
-            
-            elapsed_time = time.time() - start_time
-            if count == float('inf') and elapsed_time >= max_duration_seconds:
-                logger.info(f"Reached max duration {max_duration_hours}h")
-                break
-            
-            event = self.anomaly_injector.inject(base_event)
-            
-            self.window_5min.add_event(event)
-            self.window_1hour.add_event(event)
-            
-            success = self.send_to_kinesis(event)
-            
-            if show_details:
-                has_anomaly = 'anomaly_flags' in event
-                anomaly_marker = " [ANOMALY]" if has_anomaly else ""
-                risk = event['risk']['risk_level']
-                customer_id = event['customer']['customer_id']
+        # Per-event lines are logged at DEBUG, so asking for them lowers only this module's logger;
+        # with details off, the hoisted flag keeps the formatting out of the loop entirely
+        if show_details and not logger.isEnabledFor(logging.DEBUG):
+            logger.setLevel(logging.DEBUG)
+        
+        # This thread generates and paces events; sender threads drain the queue to Kinesis
+        executor = ThreadPoolExecutor(max_workers=ProducerConfig.SENDER_WORKERS)
+        senders = [executor.submit(self._send_loop) for _ in range(ProducerConfig.SENDER_WORKERS)]
+        
+        # The loop runs once per event, so the bound methods it calls are looked up once here
+        inject = self.anomaly_injector.inject
+        add_to_windows = self.windows.add_event
+        enqueue = self._enqueue
+        wait_between_events = self.latency_simulator.wait_between_events
+        stats_interval = ProducerConfig.STATS_INTERVAL
+        
+        try:
+            for base_event in self.data_generator.stream_events(count=None):
+                i += 1
                 
-                logger.info(f"Event {i}: {customer_id} | {risk}{anomaly_marker}")
-            
-            latency_info = self.latency_simulator.wait_between_events()
-            if latency_info['is_spike']:
-                logger.warning(f"Latency spike: {latency_info['actual_latency_ms']:.0f}ms")
-            
-            if i % 20 == 0:
-                self._show_stats()
-            
-            if count != float('inf') and i >= count:
-                break
+                if time.time() >= deadline:
+                    logger.info(f"Reached max duration {max_duration_hours}h")
+                    break
+                
+                event = inject(base_event)
+                
+                add_to_windows(event)
+                
+                enqueue(event, senders)
+                
+                if show_details:
+                    anomaly_marker = " [ANOMALY]" if 'anomaly_flags' in event else ""
+                    logger.debug("Event %d: %s | %s%s", i, event['customer']['customer_id'],
+                                 event['risk']['risk_level'], anomaly_marker)
+                
+                latency_info = wait_between_events()
+                if latency_info['is_spike']:
+                    logger.warning(f"Latency spike: {latency_info['actual_latency_ms']:.0f}ms")
+                
+                if i % stats_interval == 0:
+                    self._show_stats()
+                
+                if i >= count:
+                    break
+                
+        finally:
+            # Stop the senders, then ship whatever is still buffered, including on Ctrl+C
+            self._stop_senders(senders)
+            executor.shutdown(wait=True)
+            self.flush()
+        
+        # A sender that died after the last put is only noticed here
+        for future in senders:
+            future.result()
         
         self._show_final()
     
     def _show_stats(self):
-        stats_5min = self.window_5min.get_window_stats()
-        stats_1hour = self.window_1hour.get_window_stats()
+        stats_5min = self.windows.get_window_stats(300)
+        stats_1hour = self.windows.get_window_stats(3600)
         
         logger.info(f"5min: {stats_5min['total_events']} events, {stats_5min['anomalies']} anomalies | "
                    f"1h: {stats_1hour['total_events']} events")
@@ -5,23 +5,15 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-import boto3
-from config.settings import AWSConfig, DynamoDBConfig
+from config.aws_clients import get_dynamodb_client
+from config.settings import DynamoDBConfig
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
 def clean_dynamodb():
-    AWSConfig.set_env_vars()
-    
-    dynamodb = boto3.client(
-        'dynamodb',
-        endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
-        region_name=AWSConfig.REGION,
-        aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
-        aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY
-    )
+    dynamodb = get_dynamodb_client()
     
     table_name = DynamoDBConfig.BRONZE_TABLE_NAME
     
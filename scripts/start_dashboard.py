@@ -4,8 +4,12 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
+from waitress import serve
+
 from analytics.dashboard.app import app
+from config.settings import DashboardConfig
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Production WSGI server: async socket handling with a fixed pool of worker threads
+    serve(app, host=DashboardConfig.HOST, port=DashboardConfig.PORT, threads=DashboardConfig.THREADS)
 
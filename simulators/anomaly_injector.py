@@ -1,121 +1,176 @@
-import copy
 import logging
 import random
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+# Flags are shared by every event they are attached to and must be treated as read-only
+_FLAG_CREDIT_HIGH = {
+    "type": "UNUSUAL_CREDIT_LIMIT_HIGH",
+    "severity": "HIGH",
+    "description": "Credit limit exceeds normal range by 10x"
+}
+_FLAG_CREDIT_LOW = {
+    "type": "UNUSUAL_CREDIT_LIMIT_LOW",
+    "severity": "MEDIUM",
+    "description": "Credit limit below minimum threshold"
+}
+_FLAG_CREDIT_NEGATIVE = {
+    "type": "INVALID_CREDIT_LIMIT",
+    "severity": "CRITICAL",
+    "description": "Negative credit limit detected"
+}
+_FLAG_PAYMENT_DELAYS = {
+    "type": "SEVERE_PAYMENT_DELAYS",
+    "severity": "HIGH",
+    "description": "Consistent payment delays across all months"
+}
+_FLAG_OVERPAYMENT = {
+    "type": "EXCESSIVE_OVERPAYMENT",
+    "severity": "HIGH",
+    "description": "Payment amounts significantly exceed billing amounts"
+}
+_FLAG_NON_PAYMENT = {
+    "type": "CONSISTENT_NON_PAYMENT",
+    "severity": "CRITICAL",
+    "description": "High billing with zero payments across all months"
+}
+_FLAG_DEMOGRAPHIC = {
+    "type": "DEMOGRAPHIC_INCONSISTENCY",
+    "severity": "MEDIUM",
+    "description": "Graduate school education inconsistent with age"
+}
+_FLAG_DUPLICATE = {
+    "type": "DUPLICATE_EVENT",
+    "severity": "LOW",
+    "description": "Potential duplicate event detected"
+}
+_FLAG_MISSING_FIELDS = {
+    "type": "MISSING_CRITICAL_FIELDS",
+    "severity": "HIGH",
+    "description": "One or more critical fields are missing"
+}
+
+
+def _shallow_clone(event: Dict, *paths: Tuple[str, ...], in_place: bool = False) -> Dict:
+    # Copies only the dicts along each path, untouched subtrees stay shared with the original event
+    clone = event if in_place else event.copy()
+    for path in paths:
+        node = clone
+        for key in path:
+            node[key] = node[key].copy()
+            node = node[key]
+    return clone
+
+
 class AnomalyInjector:
     
-    def __init__(self, anomaly_rate: float = 0.05, seed: Optional[int] = None):
+    def __init__(self, anomaly_rate: float = 0.05, seed: Optional[int] = None, mutate_in_place: bool = False):
         if not 0.0 <= anomaly_rate <= 1.0:
             raise ValueError("anomaly_rate must be between 0.0 and 1.0")
         
         self.anomaly_rate = anomaly_rate
-        if seed:
-            random.seed(seed)
+        # Ownership-transfer mode: the caller hands the event over and never reads it again,
+        # so the top-level dict is modified and returned instead of copied
+        self.mutate_in_place = mutate_in_place
+        # Instance-local generator: other simulators seeding their own never disturb this sequence
+        self._rnd = random.Random(seed)
+        
+        # Six types of anomalies available for injection
+        self._anomaly_types = (
+            self._inject_unusual_credit_limit,
+            self._inject_payment_pattern_anomaly,
+            self._inject_billing_mismatch,
+            self._inject_demographic_inconsistency,
+            self._inject_duplicate_event,
+            self._inject_missing_fields
+        )
+        # Anomaly type picks are drawn in bulk and popped one per injected anomaly
+        self._rng = np.random.default_rng(seed)
+        self._type_buf = []
         
         self.anomaly_count = 0
         self.total_processed = 0
         
         logger.info(f"AnomalyInjector configured with anomaly rate: {anomaly_rate*100:.1f}%")
     
+    def _clone(self, event: Dict, *paths: Tuple[str, ...]) -> Dict:
+        # Nested dicts along paths are copied even in place: they may be shared with other events
+        return _shallow_clone(event, *paths, in_place=self.mutate_in_place)
+    
     def _should_inject_anomaly(self) -> bool:
-        return random.random() < self.anomaly_rate
+        return self._rnd.random() < self.anomaly_rate
     
     def _inject_unusual_credit_limit(self, event: Dict) -> Dict:
-        event_copy = copy.deepcopy(event)
+        event_copy = self._clone(event, ('credit',))
         
-        choice = random.choice(['extremely_high', 'extremely_low', 'negative'])
+        choice = self._rnd.choice(['extremely_high', 'extremely_low', 'negative'])
         
         if choice == 'extremely_high':
-            event_copy['credit']['credit_limit'] = random.randint(5_000_000, 10_000_000)
-            event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-            event_copy['anomaly_flags'].append({
-                "type": "UNUSUAL_CREDIT_LIMIT_HIGH",
-                "severity": "HIGH",
-                "description": "Credit limit exceeds normal range by 10x"
-            })
+            event_copy['credit']['credit_limit'] = self._rnd.randint(5_000_000, 10_000_000)
+            event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+            event_copy['anomaly_flags'].append(_FLAG_CREDIT_HIGH)
         
         elif choice == 'extremely_low':
-            event_copy['credit']['credit_limit'] = random.randint(100, 1000)
-            event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-            event_copy['anomaly_flags'].append({
-                "type": "UNUSUAL_CREDIT_LIMIT_LOW",
-                "severity": "MEDIUM",
-                "description": "Credit limit below minimum threshold"
-            })
+            event_copy['credit']['credit_limit'] = self._rnd.randint(100, 1000)
+            event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+            event_copy['anomaly_flags'].append(_FLAG_CREDIT_LOW)
         
         else:
-            event_copy['credit']['credit_limit'] = random.randint(-100000, -1000)
-            event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-            event_copy['anomaly_flags'].append({
-                "type": "INVALID_CREDIT_LIMIT",
-                "severity": "CRITICAL",
-                "description": "Negative credit limit detected"
-            })
+            event_copy['credit']['credit_limit'] = self._rnd.randint(-100000, -1000)
+            event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+            event_copy['anomaly_flags'].append(_FLAG_CREDIT_NEGATIVE)
         
         return event_copy
     
     def _inject_payment_pattern_anomaly(self, event: Dict) -> Dict:
-        event_copy = copy.deepcopy(event)
+        event_copy = self._clone(event)
         
-        for month in event_copy['payment_history'].keys():
-            event_copy['payment_history'][month] = random.randint(5, 9)
+        event_copy['payment_history'] = [self._rnd.randint(5, 9) for _ in range(6)]
         
-        event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-        event_copy['anomaly_flags'].append({
-            "type": "SEVERE_PAYMENT_DELAYS",
-            "severity": "HIGH",
-            "description": "Consistent payment delays across all months"
-        })
+        event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+        event_copy['anomaly_flags'].append(_FLAG_PAYMENT_DELAYS)
         
         return event_copy
     
     def _inject_billing_mismatch(self, event: Dict) -> Dict:
-        event_copy = copy.deepcopy(event)
-        
-        choice = random.choice(['overpayment', 'underpayment'])
+        choice = self._rnd.choice(['overpayment', 'underpayment'])
         
         if choice == 'overpayment':
-            for month in event_copy['billing_amounts'].keys():
-                bill = event_copy['billing_amounts'][month]
+            event_copy = self._clone(event, ('payment_amounts',))
+            
+            for i, bill in enumerate(event_copy['billing_amounts']):
                 if bill > 0:
-                    event_copy['payment_amounts'][month] = bill * random.randint(5, 20)
+                    event_copy['payment_amounts'][i] = bill * self._rnd.randint(5, 20)
             
-            event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-            event_copy['anomaly_flags'].append({
-                "type": "EXCESSIVE_OVERPAYMENT",
-                "severity": "HIGH",
-                "description": "Payment amounts significantly exceed billing amounts"
-            })
+            event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+            event_copy['anomaly_flags'].append(_FLAG_OVERPAYMENT)
         
         else:
-            for month in event_copy['billing_amounts'].keys():
-                event_copy['billing_amounts'][month] = random.randint(50000, 200000)
-                event_copy['payment_amounts'][month] = 0
+            event_copy = self._clone(event)
             
-            event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-            event_copy['anomaly_flags'].append({
-                "type": "CONSISTENT_NON_PAYMENT",
-                "severity": "CRITICAL",
-                "description": "High billing with zero payments across all months"
-            })
+            event_copy['billing_amounts'] = [self._rnd.randint(50000, 200000) for _ in range(6)]
+            event_copy['payment_amounts'] = [0] * 6
+            
+            event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+            event_copy['anomaly_flags'].append(_FLAG_NON_PAYMENT)
         
         return event_copy
     
     def _inject_demographic_inconsistency(self, event: Dict) -> Dict:
-        event_copy = copy.deepcopy(event)
+        event_copy = self._clone(event, ('customer', 'demographic'))
         
-        choice = random.choice(['impossible_age', 'inconsistent_education'])
+        choice = self._rnd.choice(['impossible_age', 'inconsistent_education'])
         
         if choice == 'impossible_age':
-            event_copy['customer']['demographic']['age'] = random.choice(
-                [random.randint(5, 15), random.randint(120, 200)]
+            event_copy['customer']['demographic']['age'] = self._rnd.choice(
+                [self._rnd.randint(5, 15), self._rnd.randint(120, 200)]
             )
             
-            event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
+            event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
             event_copy['anomaly_flags'].append({
                 "type": "INVALID_AGE",
                 "severity": "MEDIUM",
@@ -123,46 +178,35 @@ class AnomalyInjector:
             })
         
         else:
-            event_copy['customer']['demographic']['age'] = random.randint(12, 16)
+            event_copy['customer']['demographic']['age'] = self._rnd.randint(12, 16)
             event_copy['customer']['demographic']['education'] = "GRADUATE_SCHOOL"
             
-            event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-            event_copy['anomaly_flags'].append({
-                "type": "DEMOGRAPHIC_INCONSISTENCY",
-                "severity": "MEDIUM",
-                "description": "Graduate school education inconsistent with age"
-            })
+            event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+            event_copy['anomaly_flags'].append(_FLAG_DEMOGRAPHIC)
         
         return event_copy
     
     def _inject_duplicate_event(self, event: Dict) -> Dict:
-        event_copy = copy.deepcopy(event)
+        event_copy = self._clone(event)
         
         event_copy['is_duplicate'] = True
-        event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-        event_copy['anomaly_flags'].append({
-            "type": "DUPLICATE_EVENT",
-            "severity": "LOW",
-            "description": "Potential duplicate event detected"
-        })
+        event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+        event_copy['anomaly_flags'].append(_FLAG_DUPLICATE)
         
         return event_copy
     
     def _inject_missing_fields(self, event: Dict) -> Dict:
-        event_copy = copy.deepcopy(event)
+        if 'demographic' in event.get('customer', {}):
+            event_copy = self._clone(event, ('customer', 'demographic'))
+            event_copy['customer']['demographic']['age'] = None
+        else:
+            event_copy = self._clone(event)
         
         if 'payment_amounts' in event_copy:
             del event_copy['payment_amounts']
         
-        if 'demographic' in event_copy.get('customer', {}):
-            event_copy['customer']['demographic']['age'] = None
-        
-        event_copy['anomaly_flags'] = event_copy.get('anomaly_flags', [])
-        event_copy['anomaly_flags'].append({
-            "type": "MISSING_CRITICAL_FIELDS",
-            "severity": "HIGH",
-            "description": "One or more critical fields are missing"
-        })
+        event_copy['anomaly_flags'] = list(event.get('anomaly_flags', ()))
+        event_copy['anomaly_flags'].append(_FLAG_MISSING_FIELDS)
         
         return event_copy
     
@@ -172,18 +216,11 @@ class AnomalyInjector:
         if not self._should_inject_anomaly():
             return event
         
-        # Six types of anomalies available for injection
-        anomaly_types = [
-            self._inject_unusual_credit_limit,
-            self._inject_payment_pattern_anomaly,
-            self._inject_billing_mismatch,
-            self._inject_demographic_inconsistency,
-            self._inject_duplicate_event,
-            self._inject_missing_fields
-        ]
+        if not self._type_buf:
+            self._type_buf = self._rng.integers(0, len(self._anomaly_types), size=4096).tolist()
         
         # Randomly select one anomaly type to inject
-        anomaly_func = random.choice(anomaly_types)
+        anomaly_func = self._anomaly_types[self._type_buf.pop()]
         anomalous_event = anomaly_func(event)
         
         self.anomaly_count += 1
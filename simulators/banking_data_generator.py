@@ -1,115 +1,160 @@
 import logging
-import random
-from datetime import datetime, timedelta
+import os
+import tempfile
+import zipfile
+from datetime import datetime
 from typing import Dict, Iterator, Optional
 
+import numpy as np
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Dataset codes are small ints, so each table is indexed directly by code
+_SEX_TABLE = ("F", "M")
+_EDU_TABLE = ("UNKNOWN", "GRADUATE_SCHOOL", "UNIVERSITY", "HIGH_SCHOOL", "OTHERS", "UNKNOWN", "UNKNOWN")
+_MAR_TABLE = ("UNKNOWN", "MARRIED", "SINGLE", "OTHERS")
+
+TIMESTAMP_CHUNK_SIZE = 4096
+
+# Month order of the payment_history, billing_amounts and payment_amounts lists
+MONTHS = ("september", "august", "july", "june", "may", "april")
+
+
+def _label_column(codes: np.ndarray, table: tuple) -> list:
+    # Out-of-range codes fall back to index 0 ("F" / "UNKNOWN")
+    return [table[code] if 0 <= code < len(table) else table[0] for code in codes.tolist()]
+
+
+def _iter_timestamps(base_time: datetime, count: Optional[int] = None) -> Iterator[str]:
+    # ISO strings one second apart, formatted by NumPy a chunk at a time instead of isoformat() per event;
+    # whole-second bases use second precision so the text matches datetime.isoformat()
+    base = np.datetime64(base_time, 'us' if base_time.microsecond else 's')
+    offset = 0
+    while count is None or offset < count:
+        size = TIMESTAMP_CHUNK_SIZE if count is None else min(TIMESTAMP_CHUNK_SIZE, count - offset)
+        seconds = np.arange(offset, offset + size).astype('timedelta64[s]')
+        yield from (base + seconds).astype(str).tolist()
+        offset += size
+
+
+def _load_dataset(dataset_path: str) -> pd.DataFrame:
+    # Parsing the spreadsheet takes seconds, so its columns are cached next to it as an .npz file
+    cache_path = f"{dataset_path}.npz"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(dataset_path):
+        try:
+            with np.load(cache_path) as columns:
+                return pd.DataFrame({name: columns[name] for name in columns.files})
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile) as e:
+            logger.warning(f"Ignoring unreadable dataset cache {cache_path}, rebuilding it: {e}")
+    
+    df = pd.read_excel(dataset_path, header=0)
+    
+    # Written to a temporary file and renamed into place, so a killed or concurrent run never leaves a partial cache
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **{name: df[name].to_numpy() for name in df.columns})
+        # mkstemp creates owner-only files; the cache is as readable as the dataset next to it
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write dataset cache {cache_path}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return df
+
 
 class BankingDataGenerator:
     
     def __init__(self, dataset_path: str, seed: Optional[int] = None):
-        if seed:
-            random.seed(seed)
-        
-        self.df = pd.read_excel(dataset_path, header=0)
+        self.df = _load_dataset(dataset_path)
         self.total_records = len(self.df)
         self.current_index = 0
         
+        # event_id suffixes are drawn in bulk and popped one per event
+        self._rng = np.random.default_rng(seed)
+        self._suffix_buf = []
+        
+        # Column arrays indexed by position keep pandas out of the per-event path
+        self._id = self.df['ID'].to_numpy(dtype=np.int64)
+        self._sex = _label_column(self.df['SEX'].to_numpy(dtype=np.int8), _SEX_TABLE)
+        self._edu = _label_column(self.df['EDUCATION'].to_numpy(dtype=np.int8), _EDU_TABLE)
+        self._marriage = _label_column(self.df['MARRIAGE'].to_numpy(dtype=np.int8), _MAR_TABLE)
+        self._age = self.df['AGE'].to_numpy(dtype=np.int16)
+        self._limit = self.df['LIMIT_BAL'].to_numpy(dtype=np.int64)
+        self._pay = self.df[['PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6']].to_numpy(dtype=np.int32)
+        self._bill = self.df[[f'BILL_AMT{n}' for n in range(1, 7)]].to_numpy(dtype=np.int64)
+        self._pay_amt = self.df[[f'PAY_AMT{n}' for n in range(1, 7)]].to_numpy(dtype=np.int64)
+        self._default = self.df['default payment next month'].to_numpy(dtype=np.int8)
+        
+        # Every row's event is built once; only event_id, event_type and timestamp vary per emission
+        self._templates = [self._build_template(i) for i in range(self.total_records)]
+        self._event_id_prefixes = [f"EVT-{row_id}-" for row_id in self._id.tolist()]
+        
         logger.info(f"BankingDataGenerator dataset loaded: {self.total_records:,} records")
     
-    def _map_sex(self, sex_code: int) -> str:
-        return "M" if sex_code == 1 else "F"
-    
-    def _map_education(self, edu_code: int) -> str:
-        mapping = {
-            1: "GRADUATE_SCHOOL",
-            2: "UNIVERSITY", 
-            3: "HIGH_SCHOOL",
-            4: "OTHERS",
-            5: "UNKNOWN",
-            6: "UNKNOWN",
-            0: "UNKNOWN"
-        }
-        return mapping.get(edu_code, "UNKNOWN")
-    
-    def _map_marriage(self, mar_code: int) -> str:
-        mapping = {
-            1: "MARRIED",
-            2: "SINGLE",
-            3: "OTHERS",
-            0: "UNKNOWN"
-        }
-        return mapping.get(mar_code, "UNKNOWN")
-    
     def _generate_timestamp(self, base_time: Optional[datetime] = None) -> str:
         if base_time is None:
             base_time = datetime.now()
         
         return base_time.isoformat()
     
-    def generate_credit_event(self, 
-                             event_type: str = "CREDIT_ASSESSMENT",
-                             base_time: Optional[datetime] = None) -> Dict:
-        # Use modulo to cycle through dataset when reaching the end
-        row = self.df.iloc[self.current_index % self.total_records]
-        self.current_index += 1
+    def _build_template(self, i: int) -> Dict:
+        # event_id, event_type and timestamp are filled in per emission; placeholders keep the key order
+        row_id = self._id[i].item()
+        default_payment = self._default[i].item()
         
-        event = {
-            "event_id": f"EVT-{row['ID']}-{random.randint(1000, 9999)}",
-            "event_type": event_type,
-            "timestamp": self._generate_timestamp(base_time),
+        return {
+            "event_id": None,
+            "event_type": None,
+            "timestamp": None,
             "source_system": "CREDIT_CARD_SYSTEM",
             
             "customer": {
-                "customer_id": f"CUST-{int(row['ID']):06d}",
+                "customer_id": f"CUST-{row_id:06d}",
                 "demographic": {
-                    "sex": self._map_sex(row['SEX']),
-                    "education": self._map_education(row['EDUCATION']),
-                    "marital_status": self._map_marriage(row['MARRIAGE']),
-                    "age": int(row['AGE'])
+                    "sex": self._sex[i],
+                    "education": self._edu[i],
+                    "marital_status": self._marriage[i],
+                    "age": self._age[i].item()
                 }
             },
             
             "credit": {
-                "credit_limit": int(row['LIMIT_BAL']),
+                "credit_limit": self._limit[i].item(),
                 "currency": "TWD"
             },
             
-            "payment_history": {
-                "september": int(row['PAY_0']),
-                "august": int(row['PAY_2']),
-                "july": int(row['PAY_3']),
-                "june": int(row['PAY_4']),
-                "may": int(row['PAY_5']),
-                "april": int(row['PAY_6'])
-            },
-            
-            "billing_amounts": {
-                "september": int(row['BILL_AMT1']),
-                "august": int(row['BILL_AMT2']),
-                "july": int(row['BILL_AMT3']),
-                "june": int(row['BILL_AMT4']),
-                "may": int(row['BILL_AMT5']),
-                "april": int(row['BILL_AMT6'])
-            },
-            
-            "payment_amounts": {
-                "september": int(row['PAY_AMT1']),
-                "august": int(row['PAY_AMT2']),
-                "july": int(row['PAY_AMT3']),
-                "june": int(row['PAY_AMT4']),
-                "may": int(row['PAY_AMT5']),
-                "april": int(row['PAY_AMT6'])
-            },
+            "payment_history": self._pay[i].tolist(),
+            "billing_amounts": self._bill[i].tolist(),
+            "payment_amounts": self._pay_amt[i].tolist(),
             
             "risk": {
-                "default_payment_next_month": int(row['default payment next month']),
-                "risk_level": "HIGH" if row['default payment next month'] == 1 else "LOW"
+                "default_payment_next_month": default_payment,
+                "risk_level": "HIGH" if default_payment == 1 else "LOW"
             }
         }
+    
+    def generate_credit_event(self, 
+                             event_type: str = "CREDIT_ASSESSMENT",
+                             base_time: Optional[datetime] = None) -> Dict:
+        return self._build_event(event_type, self._generate_timestamp(base_time))
+    
+    def _build_event(self, event_type: str, timestamp: str) -> Dict:
+        # Use modulo to cycle through dataset when reaching the end
+        i = self.current_index % self.total_records
+        self.current_index += 1
+        
+        if not self._suffix_buf:
+            self._suffix_buf = self._rng.integers(1000, 10000, size=4096).tolist()
+        
+        # Nested dicts are shared with the template and every earlier event built from this row
+        event = self._templates[i].copy()
+        event["event_id"] = f"{self._event_id_prefixes[i]}{self._suffix_buf.pop()}"
+        event["event_type"] = event_type
+        event["timestamp"] = timestamp
         
         return event
     
@@ -117,20 +162,10 @@ class BankingDataGenerator:
                      count: Optional[int] = None,
                      event_type: str = "CREDIT_ASSESSMENT",
                      start_time: Optional[datetime] = None) -> Iterator[Dict]:
-        if count is None:
-            # Infinite mode: cycles through dataset continuously
-            base_time = start_time or datetime.now()
-            i = 0
-            while True:
-                current_time = base_time + timedelta(seconds=i)
-                yield self.generate_credit_event(event_type, current_time)
-                i += 1
-        else:
-            # Finite mode: generates exactly 'count' events
-            base_time = start_time or datetime.now()
-            for i in range(count):
-                current_time = base_time + timedelta(seconds=i)
-                yield self.generate_credit_event(event_type, current_time)
+        # Infinite mode (count=None) cycles through the dataset continuously; finite mode stops after 'count'
+        base_time = start_time or datetime.now()
+        for timestamp in _iter_timestamps(base_time, count):
+            yield self._build_event(event_type, timestamp)
     
     def reset(self):
         self.current_index = 0
@@ -1,12 +1,23 @@
+import asyncio
 import logging
 import random
 import statistics
 import time
-from datetime import datetime
+from collections import deque
 from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+# Median is taken over the most recent samples only; mean/stddev/min/max cover every sample
+MEDIAN_SAMPLE_SIZE = 10_000
+# Sleeps end this far before the deadline and spin the rest, since OS sleep overshoots by up to ~1ms
+SPIN_SECONDS = 0.001
+
+
+def _spin_until(deadline: float):
+    while time.monotonic() < deadline:
+        pass
+
 
 class LatencySimulator:
     
@@ -15,38 +26,72 @@ class LatencySimulator:
                  jitter_ms: float = 50.0,
                  spike_probability: float = 0.05,
                  seed: Optional[int] = None):
-        if seed:
-            random.seed(seed)
+        # Instance-local generator: other simulators seeding their own never disturb this sequence
+        self._rnd = random.Random(seed)
         
         self.base_latency_ms = base_latency_ms
         self.jitter_ms = jitter_ms
         self.spike_probability = spike_probability
         
-        self.latencies = []
         self.spike_count = 0
+        self._reset_latency_stats()
         
         logger.info(f"LatencySimulator configured - Base: {base_latency_ms}ms, "
                    f"Jitter: {jitter_ms}ms, Spike prob: {spike_probability*100:.1f}%")
     
     def _calculate_latency(self) -> float:
         # Gaussian distribution for realistic latency variation
-        latency = random.gauss(self.base_latency_ms, self.jitter_ms / 2)
+        latency = self._rnd.gauss(self.base_latency_ms, self.jitter_ms / 2)
         
         latency = max(0, latency)
         
         # Randomly inject latency spikes
-        if random.random() < self.spike_probability:
-            spike_multiplier = random.uniform(5, 20)
+        if self._rnd.random() < self.spike_probability:
+            spike_multiplier = self._rnd.uniform(5, 20)
             latency *= spike_multiplier
             self.spike_count += 1
         
         return latency
     
+    def _reset_latency_stats(self):
+        self.latencies = deque(maxlen=MEDIAN_SAMPLE_SIZE)
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = float('inf')
+        self._max = float('-inf')
+    
+    def _record_latency(self, latency_ms: float):
+        # Welford's online update keeps mean and variance without storing every sample
+        self.latencies.append(latency_ms)
+        self._count += 1
+        delta = latency_ms - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (latency_ms - self._mean)
+        if latency_ms < self._min:
+            self._min = latency_ms
+        if latency_ms > self._max:
+            self._max = latency_ms
+    
     def wait(self) -> float:
         latency_ms = self._calculate_latency()
-        self.latencies.append(latency_ms)
+        self._record_latency(latency_ms)
+        
+        deadline = time.monotonic() + latency_ms / 1000.0
+        remaining = deadline - time.monotonic() - SPIN_SECONDS
+        if remaining > 0:
+            time.sleep(remaining)
+        _spin_until(deadline)
+        
+        return latency_ms
+    
+    async def wait_async(self) -> float:
+        # Same as wait(), but yields to the event loop so one thread can drive many pending waits.
+        # No final spin here: busy-waiting would stall every other task on the loop
+        latency_ms = self._calculate_latency()
+        self._record_latency(latency_ms)
         
-        time.sleep(latency_ms / 1000.0)
+        await asyncio.sleep(latency_ms / 1000.0)
         
         return latency_ms
     
@@ -99,85 +144,116 @@ class LatencySimulator:
                    f"(base={config['base']}ms, jitter={config['jitter']}ms)")
     
     def get_stats(self) -> Dict:
-        if not self.latencies:
+        if not self._count:
             return {
                 "count": 0,
                 "message": "No latency data yet"
             }
         
         return {
-            "count": len(self.latencies),
-            "mean_ms": statistics.mean(self.latencies),
+            "count": self._count,
+            "mean_ms": self._mean,
             "median_ms": statistics.median(self.latencies),
-            "min_ms": min(self.latencies),
-            "max_ms": max(self.latencies),
-            "stddev_ms": statistics.stdev(self.latencies) if len(self.latencies) > 1 else 0,
+            "min_ms": self._min,
+            "max_ms": self._max,
+            "stddev_ms": (self._m2 / (self._count - 1)) ** 0.5 if self._count > 1 else 0,
             "spike_count": self.spike_count,
-            "spike_rate": self.spike_count / len(self.latencies) if self.latencies else 0
+            "spike_rate": self.spike_count / self._count
         }
     
     def reset_stats(self):
-        self.latencies = []
+        self._reset_latency_stats()
         self.spike_count = 0
 
 
+class _WindowCounters:
+    # Running totals over the entries currently inside one window
+    __slots__ = ('entries', 'high_risk', 'low_risk', 'anomalies', 'credit_sum')
+    
+    def __init__(self):
+        self.entries = deque()
+        self.high_risk = 0
+        self.low_risk = 0
+        self.anomalies = 0
+        self.credit_sum = 0
+
+
 class WindowAggregator:
     
-    def __init__(self, window_size_seconds: int = 300):
-        self.window_size_seconds = window_size_seconds
-        self.events = []
+    def __init__(self, window_sizes: tuple = (300,)):
+        self.window_sizes = tuple(sorted(window_sizes))
+        self.max_window_seconds = self.window_sizes[-1]
+        # Each window keeps its own totals, updated as entries arrive and expire
+        self.windows = {size: _WindowCounters() for size in self.window_sizes}
+        self._last_timestamp = float('-inf')
         
-        logger.info(f"WindowAggregator window configured: {window_size_seconds}s "
-                   f"({window_size_seconds/60:.1f} minutes)")
+        sizes = ', '.join(f"{size}s ({size/60:.1f} minutes)" for size in self.window_sizes)
+        logger.info(f"WindowAggregator windows configured: {sizes}")
     
-    def add_event(self, event: Dict, timestamp: Optional[datetime] = None):
+    def add_event(self, event: Dict, timestamp: Optional[float] = None):
+        # Timestamps are POSIX seconds so expiry checks compare plain floats
+        # Expiry pops from the left of each deque, which is only correct while entries arrive in time order.
+        # A wall clock stepping back is clamped; an explicit out-of-order timestamp is rejected
         if timestamp is None:
-            timestamp = datetime.now()
+            timestamp = max(time.time(), self._last_timestamp)
+        elif timestamp < self._last_timestamp:
+            raise ValueError(f"timestamp {timestamp} is older than the newest entry {self._last_timestamp}")
+        self._last_timestamp = timestamp
+        
+        # Only the fields the stats need are kept, so windows never pin whole event dicts
+        risk_level = event.get('risk', {}).get('risk_level')
+        is_high = risk_level == 'HIGH'
+        is_low = risk_level == 'LOW'
+        is_anomaly = 'anomaly_flags' in event
+        credit_limit = event.get('credit', {}).get('credit_limit', 0)
+        entry = (timestamp, is_high, is_low, is_anomaly, credit_limit)
+        
+        for window in self.windows.values():
+            window.entries.append(entry)
+            window.high_risk += is_high
+            window.low_risk += is_low
+            window.anomalies += is_anomaly
+            window.credit_sum += credit_limit
         
-        self.events.append((timestamp, event))
         self._cleanup_old_events()
     
     def _cleanup_old_events(self):
-        now = datetime.now()
-        cutoff = now.timestamp() - self.window_size_seconds
+        now = time.time()
         
-        self.events = [
-            (ts, evt) for ts, evt in self.events 
-            if ts.timestamp() >= cutoff
-        ]
+        for size, window in self.windows.items():
+            cutoff = now - size
+            entries = window.entries
+            while entries and entries[0][0] < cutoff:
+                _, is_high, is_low, is_anomaly, credit_limit = entries.popleft()
+                window.high_risk -= is_high
+                window.low_risk -= is_low
+                window.anomalies -= is_anomaly
+                window.credit_sum -= credit_limit
     
-    def get_window_events(self) -> list:
-        self._cleanup_old_events()
-        return [evt for _, evt in self.events]
-    
-    def get_window_stats(self) -> Dict:
+    def get_window_stats(self, window_size_seconds: Optional[int] = None) -> Dict:
+        if window_size_seconds is None:
+            window_size_seconds = self.max_window_seconds
+        if window_size_seconds not in self.windows:
+            raise ValueError(f"Window {window_size_seconds}s is not configured. "
+                           f"Options: {list(self.window_sizes)}")
+        
         self._cleanup_old_events()
-        events = [evt for _, evt in self.events]
+        window = self.windows[window_size_seconds]
+        total = len(window.entries)
         
-        if not events:
+        if not total:
             return {
                 "count": 0,
-                "window_size_seconds": self.window_size_seconds
+                "window_size_seconds": window_size_seconds
             }
         
-        high_risk = sum(1 for e in events if e.get('risk', {}).get('risk_level') == 'HIGH')
-        low_risk = sum(1 for e in events if e.get('risk', {}).get('risk_level') == 'LOW')
-        
-        anomalies = sum(1 for e in events if 'anomaly_flags' in e)
-        
-        credit_limits = [
-            e.get('credit', {}).get('credit_limit', 0) 
-            for e in events
-        ]
-        avg_credit_limit = statistics.mean(credit_limits) if credit_limits else 0
-        
         return {
-            "window_size_seconds": self.window_size_seconds,
-            "total_events": len(events),
-            "high_risk_events": high_risk,
-            "low_risk_events": low_risk,
-            "anomalies": anomalies,
-            "anomaly_rate": anomalies / len(events) if events else 0,
-            "avg_credit_limit": avg_credit_limit,
-            "events_per_second": len(events) / self.window_size_seconds
+            "window_size_seconds": window_size_seconds,
+            "total_events": total,
+            "high_risk_events": window.high_risk,
+            "low_risk_events": window.low_risk,
+            "anomalies": window.anomalies,
+            "anomaly_rate": window.anomalies / total,
+            "avg_credit_limit": window.credit_sum / total,
+            "events_per_second": total / window_size_seconds
         }
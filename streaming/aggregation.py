@@ -0,0 +1,104 @@
+import zlib
+from typing import List
+
+# Events are packed as newline-delimited JSON; orjson never emits a raw newline inside a document
+_SEPARATOR = b'\n'
+
+# Compressed payloads start with this byte; plain NDJSON always starts with '{'
+_COMPRESSED_MARKER = b'\x01'
+_COMPRESSION_LEVEL = 6
+# Room kept for deflate block headers, sync-flush markers and the closing checksum
+_DEFLATE_OVERHEAD = 32
+
+# Preset dictionary of the event skeleton so even single-event records compress well.
+# Records written with it can only be read back with the same bytes: never edit, add a new marker instead
+_ZDICT = (
+    b'{"type":"DEMOGRAPHIC_INCONSISTENCY","severity":"MEDIUM","description":"'
+    b'"anomaly_flags":[{"type":"'
+    b'{"event_id":"EVT-","event_type":"CREDIT_ASSESSMENT","timestamp":"2026-01-01T00:00:00.000000",'
+    b'"source_system":"CREDIT_CARD_SYSTEM","customer":{"customer_id":"CUST-0","demographic":'
+    b'{"sex":"F","education":"UNIVERSITY","marital_status":"SINGLE","age":'
+    b'"credit":{"credit_limit":0000,"currency":"TWD"},"payment_history":[0,0,0,0,-1,-2],'
+    b'"billing_amounts":[0,0,0,0,0,0],"payment_amounts":[0,0,0,0,0,0],'
+    b'"risk":{"default_payment_next_month":0,"risk_level":"LOW"}}'
+)
+
+
+class AggregatedRecord:
+    
+    def __init__(self, partition_key: str, max_bytes: int, compress: bool = False):
+        self.partition_key = partition_key
+        self.max_bytes = max_bytes
+        self.compress = compress
+        # Plain records keep the event documents; compressed ones keep the marker and deflate output
+        self.parts = []
+        self.count = 0
+        # Final payload size: exact for plain records, an upper bound while a compressed one is open
+        self.size = 0
+        self._compressor = None
+        self._emitted = 0
+        self._unflushed = 0
+        
+        if compress:
+            self._compressor = zlib.compressobj(_COMPRESSION_LEVEL, zdict=_ZDICT)
+            self.parts.append(_COMPRESSED_MARKER)
+            self._emitted = len(_COMPRESSED_MARKER)
+            self.size = self._emitted + _DEFLATE_OVERHEAD
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def can_fit(self, data: bytes) -> bool:
+        # An empty record always accepts one event, even one larger than max_bytes
+        if not self.count or self.size + len(_SEPARATOR) + len(data) <= self.max_bytes:
+            return True
+        if self._compressor is None or not self._unflushed:
+            return False
+        
+        # The bound counts input still buffered in zlib at full size; a sync flush replaces it with
+        # the real compressed size. Only done near the limit, since every flush costs some ratio
+        self._sync()
+        return self.size + len(_SEPARATOR) + len(data) <= self.max_bytes
+    
+    def add(self, data: bytes):
+        if self._compressor is None:
+            if self.count:
+                self.size += len(_SEPARATOR)
+            self.parts.append(data)
+            self.size += len(data)
+        else:
+            if self.count:
+                data = _SEPARATOR + data
+            self._write(self._compressor.compress(data))
+            self._unflushed += len(data)
+            self.size = self._emitted + self._unflushed + _DEFLATE_OVERHEAD
+        self.count += 1
+    
+    def to_record(self) -> dict:
+        if not self.compress:
+            return {'Data': _SEPARATOR.join(self.parts), 'PartitionKey': self.partition_key}
+        
+        # Retries call this again, so the stream is only finished the first time
+        if self._compressor is not None:
+            self._write(self._compressor.flush())
+            self._compressor = None
+            self._unflushed = 0
+            self.size = self._emitted
+        return {'Data': b''.join(self.parts), 'PartitionKey': self.partition_key}
+    
+    def _write(self, chunk: bytes):
+        if chunk:
+            self.parts.append(chunk)
+            self._emitted += len(chunk)
+    
+    def _sync(self):
+        self._write(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self._unflushed = 0
+        self.size = self._emitted + _DEFLATE_OVERHEAD
+
+
+def deaggregate(data: bytes) -> List[bytes]:
+    if data[:1] == _COMPRESSED_MARKER:
+        data = zlib.decompressobj(zdict=_ZDICT).decompress(data[1:])
+    # Records written before aggregation hold a single event and come back as a one-element list
+    return data.split(_SEPARATOR)
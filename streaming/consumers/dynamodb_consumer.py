@@ -1,61 +1,161 @@
-import json
 import logging
+import os
+import queue
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from decimal import Decimal
 
-import boto3
+import orjson
 from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
 
-from config.settings import AWSConfig, KinesisConfig, DynamoDBConfig, ConsumerConfig
+from config.aws_clients import get_dynamodb_client, get_kinesis_client
+from config.settings import KinesisConfig, DynamoDBConfig, ConsumerConfig, PathConfig
+from streaming.aggregation import deaggregate
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+_TYPE_SERIALIZER = TypeSerializer()
+
+
+def _serialize_value(value) -> dict:
+    handler = _SERIALIZERS.get(type(value))
+    if handler is None:
+        # Anything outside the event schema (sets, bytes, Decimal subclasses...) takes boto3's full path
+        return _TYPE_SERIALIZER.serialize(value)
+    return handler(value)
+
+
+# Exact-type dispatch for the JSON shapes events carry, same output as boto3's TypeSerializer
+_SERIALIZERS = {
+    str: lambda v: {'S': v},
+    int: lambda v: {'N': str(v)},
+    Decimal: lambda v: {'N': str(v)},
+    bool: lambda v: {'BOOL': v},
+    type(None): lambda v: {'NULL': True},
+    dict: lambda v: {'M': {k: _serialize_value(item) for k, item in v.items()}},
+    list: lambda v: {'L': [_serialize_value(item) for item in v]},
+}
+
+
+# Error codes worth retrying; anything else (e.g. ValidationException) fails the same way every time
+_RETRYABLE_WRITE_ERRORS = frozenset({
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+    'ServiceUnavailable',
+})
+
+
+def _is_retryable(error: ClientError) -> bool:
+    code = error.response.get('Error', {}).get('Code')
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+    return code in _RETRYABLE_WRITE_ERRORS or status >= 500
+
 
 class DynamoDBWriter:
     
     def __init__(self):
-        AWSConfig.set_env_vars()
-        
-        self.dynamodb = boto3.client(
-            'dynamodb',
-            endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
-            region_name=AWSConfig.REGION,
-            aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
-            aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY
-        )
+        self.dynamodb = get_dynamodb_client()
         
         self.table_name = DynamoDBConfig.BRONZE_TABLE_NAME
-        self.serializer = TypeSerializer()
         self.records_written = 0
         self.write_errors = 0
+        self._pending = []
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=ConsumerConfig.WRITE_WORKERS,
+            thread_name_prefix='dynamodb-writer'
+        )
     
     def serialize_event(self, event: dict) -> dict:
-        dynamodb_item = {}
+        dynamodb_item = {
+            key: _serialize_value(value)
+            for key, value in event.items()
+            if value is not None
+        }
         
-        for key, value in event.items():
-            if value is not None:
-                dynamodb_item[key] = self.serializer.serialize(value)
+        dynamodb_item['customer_id'] = {'S': event['customer']['customer_id']}
+        dynamodb_item['risk_level'] = {'S': event['risk']['risk_level']}
         
-        dynamodb_item['customer_id'] = self.serializer.serialize(
-            event['customer']['customer_id']
-        )
-        dynamodb_item['risk_level'] = self.serializer.serialize(
-            event['risk']['risk_level']
-        )
+        # Only set for anomalies, which keeps the has_anomaly index sparse
+        if 'anomaly_flags' in event:
+            dynamodb_item['has_anomaly'] = {'S': 'Y'}
+        
+        # Ingest hour rather than event time: simulated timestamps run ahead of the wall clock
+        dynamodb_item['hour_bucket'] = {
+            'S': datetime.now().strftime(DynamoDBConfig.HOUR_BUCKET_FORMAT)
+        }
         
         return dynamodb_item
     
     def write_to_dynamodb(self, event: dict) -> bool:
+        # Items are buffered until every writer thread has a full 25-item batch; call flush() to push out the rest
         dynamodb_item = self.serialize_event(event)
+        self._pending.append({'PutRequest': {'Item': dynamodb_item}})
         
-        response = self.dynamodb.put_item(
-            TableName=self.table_name,
-            Item=dynamodb_item
-        )
-        
-        self.records_written += 1
+        if len(self._pending) >= ConsumerConfig.WRITE_BATCH_SIZE * ConsumerConfig.WRITE_WORKERS:
+            self.flush()
         return True
     
+    def flush(self):
+        # BatchWriteItem rejects a request holding the same key twice, and Kinesis redelivers records,
+        # so duplicates are collapsed by primary key first; the last copy wins, as put_item would
+        pending = list({
+            (request['PutRequest']['Item']['event_id']['S'], request['PutRequest']['Item']['timestamp']['S']): request
+            for request in self._pending
+        }.values())
+        self._pending = []
+        
+        # Batches go out concurrently, but flush() only returns once all of them are written and raises
+        # if any was dropped, so callers can checkpoint right after it
+        batches = [
+            pending[start:start + ConsumerConfig.WRITE_BATCH_SIZE]
+            for start in range(0, len(pending), ConsumerConfig.WRITE_BATCH_SIZE)
+        ]
+        futures = [self._executor.submit(self._batch_write, batch) for batch in batches]
+        wait(futures)
+        for future in futures:
+            future.result()
+    
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+    
+    def _batch_write(self, requests: list):
+        for attempt in range(ConsumerConfig.WRITE_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(ConsumerConfig.WRITE_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+            
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests})
+            except ClientError as e:
+                if not _is_retryable(e):
+                    with self._stats_lock:
+                        self.write_errors += len(requests)
+                    raise
+                logger.warning(f"BatchWriteItem failed for {len(requests)} items: {e}")
+                continue
+            
+            # Throttled items come back unprocessed and are retried on their own
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            with self._stats_lock:
+                self.records_written += len(requests) - len(unprocessed)
+            if not unprocessed:
+                return
+            requests = unprocessed
+        
+        with self._stats_lock:
+            self.write_errors += len(requests)
+        raise RuntimeError(f"Dropped {len(requests)} items after {ConsumerConfig.WRITE_MAX_RETRIES} retries")
+    
     def get_stats(self) -> dict:
         return {
             'records_written': self.records_written,
@@ -66,22 +166,64 @@ class DynamoDBWriter:
 class DynamoDBConsumer:
     
     def __init__(self):
-        AWSConfig.set_env_vars()
-        
-        self.kinesis = boto3.client(
-            'kinesis',
-            endpoint_url=AWSConfig.LOCALSTACK_ENDPOINT,
-            region_name=AWSConfig.REGION,
-            aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
-            aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY
-        )
+        self.kinesis = get_kinesis_client()
         
         self.stream_name = KinesisConfig.STREAM_NAME
         self.db_writer = DynamoDBWriter()
+        self.state_path = PathConfig.get_consumer_state_path()
+        # The state file maps stream name -> shard id -> sequence number; shard ids repeat across streams
+        self._state = self._load_state()
+        self.checkpoint = self._state.setdefault(self.stream_name, {})
+    
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        
+        try:
+            with open(self.state_path, 'rb') as f:
+                state = orjson.loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable consumer state {self.state_path}: {e}")
+            return {}
+        
+        # Older state files held bare shard -> sequence pairs with no stream, so they cannot be trusted
+        if not isinstance(state, dict) or not all(isinstance(shards, dict) for shards in state.values()):
+            logger.warning(f"Ignoring consumer state {self.state_path} without stream names")
+            return {}
+        return state
+    
+    def _save_checkpoint(self):
+        # Write-then-rename so a crash never leaves a truncated state file behind
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(self._state))
+        os.replace(tmp_path, self.state_path)
     
-    def get_shard_iterator(self):
-        response = self.kinesis.describe_stream(StreamName=self.stream_name)
-        shard_id = response['StreamDescription']['Shards'][0]['ShardId']
+    def list_shard_ids(self) -> list:
+        # list_shards is far less throttled than describe_stream and returns only what is needed here
+        response = self.kinesis.list_shards(StreamName=self.stream_name)
+        return [shard['ShardId'] for shard in response['Shards']]
+    
+    def get_shard_iterator(self, shard_id: str):
+        # Resume after the last stored sequence number for this shard, otherwise start from the oldest record
+        sequence_number = self.checkpoint.get(shard_id)
+        if sequence_number:
+            try:
+                response = self.kinesis.get_shard_iterator(
+                    StreamName=self.stream_name,
+                    ShardId=shard_id,
+                    ShardIteratorType='AFTER_SEQUENCE_NUMBER',
+                    StartingSequenceNumber=sequence_number
+                )
+                logger.info(f"Resuming {shard_id} after sequence number {sequence_number}")
+                return response['ShardIterator']
+            except ClientError as e:
+                # Only a rejected sequence number (e.g. the stream was recreated) means starting over;
+                # throttling and other errors are left to the caller rather than silently re-reading
+                if e.response.get('Error', {}).get('Code') != 'InvalidArgumentException':
+                    raise
+                logger.warning(f"Checkpoint for {shard_id} is no longer valid, reading from start: {e}")
+                del self.checkpoint[shard_id]
         
         response = self.kinesis.get_shard_iterator(
             StreamName=self.stream_name,
@@ -91,6 +233,35 @@ class DynamoDBConsumer:
         
         return response['ShardIterator']
     
+    def _consume_shard(self, shard_id: str, shard_iterator: str, batches: queue.Queue, stop: threading.Event):
+        # Runs on a worker thread: reads one shard and hands decoded batches to the writer thread
+        idle_wait = ConsumerConfig.POLL_INTERVAL_SECONDS
+        while shard_iterator and not stop.is_set():
+            response = self.kinesis.get_records(
+                ShardIterator=shard_iterator,
+                Limit=ConsumerConfig.BATCH_SIZE
+            )
+            
+            records = response['Records']
+            if records:
+                idle_wait = ConsumerConfig.POLL_INTERVAL_SECONDS
+                events = [orjson.loads(part) for record in records for part in deaggregate(record['Data'])]
+                batch = (shard_id, records[-1]['SequenceNumber'], events)
+                while not stop.is_set():
+                    try:
+                        batches.put(batch, timeout=1)
+                        break
+                    except queue.Full:
+                        continue
+            else:
+                # Only idle polls back off, doubling up to a cap; a non-empty batch is followed straight away
+                # by the next read. Jitter keeps the readers of several quiet shards from polling in lockstep
+                stop.wait(idle_wait * random.uniform(0.8, 1.2))
+                idle_wait = min(idle_wait * 2, ConsumerConfig.POLL_MAX_INTERVAL_SECONDS)
+            
+            # A closed shard (after resharding) returns no next iterator
+            shard_iterator = response.get('NextShardIterator')
+    
     def consume_and_store(self, max_duration_hours: float = None):
         max_duration_hours = max_duration_hours or ConsumerConfig.MAX_DURATION_HOURS
         
@@ -98,44 +269,79 @@ class DynamoDBConsumer:
         
         start_time = time.time()
         max_duration_seconds = max_duration_hours * 3600
-        shard_iterator = self.get_shard_iterator()
+        shard_ids = self.list_shard_ids()
+        iterators = {shard_id: self.get_shard_iterator(shard_id) for shard_id in shard_ids}
+        
+        logger.info(f"Reading {len(shard_ids)} shard(s): {', '.join(shard_ids)}")
+        
+        batches = queue.Queue(maxsize=ConsumerConfig.QUEUE_SIZE)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(shard_ids), thread_name_prefix='shard-reader')
+        futures = [
+            executor.submit(self._consume_shard, shard_id, iterator, batches, stop)
+            for shard_id, iterator in iterators.items()
+        ]
         
         records_processed = 0
+        last_checkpoint_time = time.time()
         
-        while True:
-            elapsed_time = time.time() - start_time
-            if elapsed_time >= max_duration_seconds:
-                logger.info(f"Reached max duration {max_duration_hours}h")
-                break
-            
-            response = self.kinesis.get_records(
-                ShardIterator=shard_iterator,
-                Limit=ConsumerConfig.BATCH_SIZE
-            )
-            
-            records = response['Records']
-            if records:
-                for record in records:
-                    event_data = json.loads(record['Data'])
-                    
+        try:
+            while True:
+                elapsed_time = time.time() - start_time
+                if elapsed_time >= max_duration_seconds:
+                    logger.info(f"Reached max duration {max_duration_hours}h")
+                    break
+                
+                try:
+                    shard_id, sequence_number, events = batches.get(timeout=ConsumerConfig.IDLE_LOG_INTERVAL_SECONDS)
+                except queue.Empty:
+                    # Surface a reader failure instead of waiting on a shard that is no longer read
+                    for future in futures:
+                        if future.done():
+                            future.result()
+                    if all(future.done() for future in futures):
+                        logger.info("All shards are closed")
+                        break
+                    remaining_minutes = int((max_duration_seconds - elapsed_time) // 60)
+                    logger.info(f"Waiting for records ({remaining_minutes}m remaining)")
+                    continue
+                
+                # Per-event logging renders the whole payload, so it is skipped unless DEBUG is on
+                debug = logger.isEnabledFor(logging.DEBUG)
+                
+                for event_data in events:
                     self.db_writer.write_to_dynamodb(event_data)
                     records_processed += 1
                     
-                    has_anomaly = 'anomaly_flags' in event_data
-                    anomaly_marker = " [ANOMALY]" if has_anomaly else ""
-                    
-                    logger.info(f"Event {records_processed}: {event_data['event_id']}{anomaly_marker}")
-                    logger.info(json.dumps(event_data, indent=2, ensure_ascii=False))
+                    if debug:
+                        anomaly_marker = " [ANOMALY]" if 'anomaly_flags' in event_data else ""
+                        logger.debug("Event %d: %s%s", records_processed, event_data['event_id'], anomaly_marker)
+                        logger.debug("%s", orjson.dumps(event_data, option=orjson.OPT_INDENT_2).decode())
                     
                     if records_processed % ConsumerConfig.STATS_INTERVAL == 0:
-                        stats = self.db_writer.get_stats()
-                        logger.info(f"Written: {stats['records_written']} records")
-            else:
-                remaining_minutes = int((max_duration_seconds - elapsed_time) // 60)
-                logger.info(f"Waiting for records ({remaining_minutes}m remaining)")
-            
-            shard_iterator = response['NextShardIterator']
-            time.sleep(ConsumerConfig.POLL_INTERVAL_SECONDS)
+                        rate = records_processed / max(time.time() - start_time, 1e-9)
+                        logger.info("Processed %d records (%.0f rec/s)", records_processed, rate)
+                
+                # flush() raises if any item was dropped, which stops the consumer before the checkpoint
+                # moves, so a restart re-reads the batch instead of skipping unwritten records
+                self.db_writer.flush()
+                
+                self.checkpoint[shard_id] = sequence_number
+                if time.time() - last_checkpoint_time >= ConsumerConfig.CHECKPOINT_INTERVAL_SECONDS:
+                    self._save_checkpoint()
+                    last_checkpoint_time = time.time()
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+            try:
+                self.db_writer.close()
+            finally:
+                # The checkpoint only ever covers flushed batches, so it is safe to persist on any exit
+                if self.checkpoint:
+                    self._save_checkpoint()
+        
+        for future in futures:
+            future.result()
         
         elapsed = time.time() - start_time
         hours = int(elapsed // 3600)